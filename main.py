@@ -2,8 +2,16 @@
 
 from __future__ import annotations
 
-from datetime import datetime, timezone
+import asyncio
+import calendar
+from datetime import datetime, timedelta, timezone
+import functools
+import logging
+import logging.handlers
 import os
+import queue
+import sys
+import time
 from typing import Optional
 
 from discord import Embed, Interaction
@@ -11,12 +19,19 @@ from discord.ext import commands
 from discord.ext.commands.context import Context
 import discord.utils
 
-import humanize
+try:  # uvloop's faster event loop isn't available on Windows so fall back to the default asyncio one there
+    import uvloop
+except ImportError:
+    pass
+else:
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
 
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix="t!", intents=intents)
+# LLK Discord :wow: emoji - looked up once the emoji cache is populated in on_ready()
+_WOW_EMOJI = None
 
 # from https://discord.com/developers/docs/reference#message-formatting-timestamp-styles
 TIME_FORMAT_TEMPLATES = {
@@ -28,18 +43,115 @@ TIME_FORMAT_TEMPLATES = {
     # relative timestamps [e.g. 2 months ago] need to be added separately
     # since they can't use f-string date formatting after : so option must be added separately below
 }
+# bare format specs (i.e. without the surrounding '{:' and '}') so they can be passed straight to format()
+_TIME_FORMAT_SPECS = [(template[2:-1], format_key) for template, format_key in TIME_FORMAT_TEMPLATES.items()]
+# every format key - don't forget to add relative back in to the list
+_ALL_FORMAT_KEYS = tuple(TIME_FORMAT_TEMPLATES.values()) + ('R',)
+
+
+@functools.lru_cache(maxsize=64)  # comfortably more than the number of real-world UTC offsets
+def _offset_timezone(offset_secs: int) -> timezone:
+    return timezone(timedelta(seconds=offset_secs))  # raises ValueError if not strictly within ±24h
+
+
+def parse_utc_offset(offset: str) -> int:
+    """Converts a UTC offset string (e.g. +0100, -0330, +01:00) into the offset from UTC in seconds"""
+
+    if len(offset) == 5 and offset[0] in '+-' and offset[1:].isdecimal() and offset[3] <= '5':
+        offset_secs = int(offset[1:3]) * 3600 + int(offset[3:5]) * 60
+        return -offset_secs if offset[0] == '-' else offset_secs
+
+    # not the usual ±HHMM so fall back to strptime which also accepts e.g. +01:00 and Z
+    return int(datetime.strptime(offset, '%z').utcoffset().total_seconds())
+
+
+def build_datetime(year: int, month: int, day: int, hour: int, minutes: int,
+                   offset_secs: int = 0) -> tuple[datetime, int]:
+    """
+    Creates an aware datetime for the given local time and UTC offset (in seconds).
+    Also returns the matching (second-precise) unix epoch time, worked out directly from the values given.
+    """
+
+    # datetime() itself raises ValueError for out of range values (e.g. Feb 30th or 25:00)
+    time_obj = datetime(year, month, day, hour, minutes, tzinfo=_offset_timezone(offset_secs))
+    epoch_time = calendar.timegm((year, month, day, hour, minutes, 0)) - offset_secs
+    return time_obj, epoch_time
+
+
+def parse_user_datetime(date_str: str) -> tuple[datetime, int, bool]:
+    """
+    Parses a YYYY/MM/DD HH:MM[±HHMM] string into an aware datetime (UTC if no offset is given).
+    The usual zero-padded format is fixed width so slicing it up is much faster than going through
+    datetime.strptime, which is only used as a fallback for anything else it accepts (e.g. 2021/8/21 9:05).
+    Also returns the unix epoch time and whether a UTC offset was included.
+    """
+
+    if (len(date_str) in (16, 21)
+            and date_str[4] == '/' and date_str[7] == '/' and date_str[10] == ' ' and date_str[13] == ':'
+            and (date_str[0:4] + date_str[5:7] + date_str[8:10] + date_str[11:13] + date_str[14:16]).isdecimal()):
+        utc_offset_used = len(date_str) == 21
+        offset_secs = parse_utc_offset(date_str[16:]) if utc_offset_used else 0
+        year, month, day = int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10])
+        hour, minutes = int(date_str[11:13]), int(date_str[14:16])
+
+    else:
+        try:  # Assuming date_str includes a UTC offset (e.g. +01:00)
+            parsed = datetime.strptime(date_str, '%Y/%m/%d %H:%M%z')
+        except ValueError:  # maybe it didn't include a UTC offset? (raises ValueError if not either)
+            parsed = datetime.strptime(date_str, '%Y/%m/%d %H:%M')
+
+        utc_offset_used = parsed.tzinfo is not None
+        offset_secs = int(parsed.utcoffset().total_seconds()) if utc_offset_used else 0
+        year, month, day, hour, minutes = parsed.year, parsed.month, parsed.day, parsed.hour, parsed.minute
+
+    time_obj, epoch_time = build_datetime(year, month, day, hour, minutes, offset_secs)
+    return time_obj, epoch_time, utc_offset_used
+
+
+# log lines are handed to a QueueListener thread which does the (blocking) writes to stdout off the event loop
+_console_log_queue = queue.SimpleQueue()
+_console_logger = logging.getLogger('timestamp')
+_console_logger.setLevel(logging.INFO)
+_console_logger.propagate = False  # keep these separate from discord.py's own log output
+_console_logger.addHandler(logging.handlers.QueueHandler(_console_log_queue))
+_console_log_listener = logging.handlers.QueueListener(_console_log_queue, logging.StreamHandler(sys.stdout))
 
 
 def console_log_with_time(msg: str):
-    print(f'[timestamp] {datetime.now(tz=timezone.utc):%Y/%m/%d %H:%M:%S%z} - {msg}')
+    _console_logger.info(f'[timestamp] {datetime.now(tz=timezone.utc):%Y/%m/%d %H:%M:%S%z} - {msg}')
+
+
+# (unit name, length in secs) from largest to smallest - months are 30.5 days like in humanize
+# so 360-364 days still shows as '11 months' (12 months is always over a year)
+_RELATIVE_TIME_UNITS = (('year', 365 * 86400), ('month', int(30.5 * 86400)), ('day', 86400), ('hour', 3600), ('minute', 60))
+
+
+@functools.lru_cache(maxsize=512)
+def _relative_label(now_minute: int, user_minute: int) -> str:
+    """
+    Cached English relative label (e.g. 'a minute ago', '3 days from now') for two times given as whole minutes
+    since the epoch. A minimal stand-in for humanize.naturaltime which is all the precision the dropdown needs.
+    """
 
+    delta_secs = (now_minute - user_minute) * 60
+    suffix = 'ago' if delta_secs > 0 else 'from now'
 
-def create_relative_label(user_datetime: datetime) -> str:
-    """Creates a human-readable relative time label similar to that used by Discord for user_datetime"""
+    for unit, unit_secs in _RELATIVE_TIME_UNITS:
+        count = abs(delta_secs) // unit_secs
+        if count == 1:
+            return f"{'an' if unit == 'hour' else 'a'} {unit} {suffix}"
+        elif count > 1:
+            return f'{count} {unit}s {suffix}'
 
-    now = datetime.now(tz=timezone.utc)
-    time_delta = now - user_datetime
-    return humanize.naturaltime(time_delta)
+    return 'now'  # i.e. within the same minute
+
+
+def create_relative_label(epoch_time: int) -> str:
+    """Creates a human-readable relative time label similar to that used by Discord for epoch_time (in secs)"""
+
+    # labels only need to be minute accurate so bucket both times by minute to get more cache hits
+    # (time.time() is already the current epoch time so no need to create a datetime obj for now)
+    return _relative_label(int(time.time()) // 60, epoch_time // 60)
 
 
 def get_user_tag_from_origin(origin: Context | Interaction) -> str:
@@ -61,44 +173,44 @@ async def show_all_button_callback(interaction: Interaction, epoch_time):
     await send_all_timestamps_embed(interaction, epoch_time)
 
 
-def show_all_button(time_obj: datetime) -> discord.ui.Button:
+def show_all_button(epoch_time: int) -> discord.ui.Button:
     """Create a Button component to trigger showing the all timestamps embed (created below)"""
 
-    epoch_time = int(time_obj.timestamp())
-
     button = discord.ui.Button(
         label='Show All!',
         style=discord.ButtonStyle.primary,  # blurple style
-        emoji=bot.get_emoji(816705774201077830),  # id of LLK Discord :wow: emoji
+        emoji=_WOW_EMOJI,
     )
     button.callback = lambda i: show_all_button_callback(i, epoch_time)
 
     return button
 
 
+_TIMEZONE_GUIDE_EMOJI = discord.PartialEmoji(name='🕑')
+_TIMEZONE_GUIDE_URL = 'https://en.wikipedia.org/wiki/List_of_tz_database_time_zones'
+
+
 def timezone_guide_button() -> discord.ui.Button:
     return discord.ui.Button(
         label='Find out your timezone offset',
-        emoji=discord.PartialEmoji(name='🕑'),
+        emoji=_TIMEZONE_GUIDE_EMOJI,
         style=discord.ButtonStyle.link,
-        url='https://en.wikipedia.org/wiki/List_of_tz_database_time_zones'
+        url=_TIMEZONE_GUIDE_URL
     )
 
 
 class TimestampDropdown(discord.ui.Select):
-    def __init__(self, time_obj: datetime, utc_offset_used: bool):
+    def __init__(self, time_obj: datetime, epoch_time: int, utc_offset_used: bool):
         self.time_obj = time_obj
+        self.epoch_time = epoch_time  # (second-precise) unix epoch time of time_obj
         self.utc_offset_used = utc_offset_used
-        # convert *aware* datetime obj to (second-precise) unix epoch time
-        self.epoch_time = int(self.time_obj.timestamp())
 
-        options = []
         # Set the options that will be presented inside the dropdown
         # add all other options
-        for template, format_key in TIME_FORMAT_TEMPLATES.items():
-            options.append(discord.SelectOption(label=template.format(self.time_obj), value=format_key))
+        options = [discord.SelectOption(label=format(self.time_obj, spec), value=format_key)
+                   for spec, format_key in _TIME_FORMAT_SPECS]
         # and relative option
-        options.append(discord.SelectOption(label=f'{create_relative_label(self.time_obj)}', value='R'))
+        options.append(discord.SelectOption(label=f'{create_relative_label(self.epoch_time)}', value='R'))
 
         # The placeholder is what will be shown when no option is chosen
         # The min and max values indicate we can only pick one of the three options
@@ -107,6 +219,9 @@ class TimestampDropdown(discord.ui.Select):
                          min_values=1, max_values=1, options=options)
 
     async def callback(self, interaction: Interaction):
+        # acknowledge straight away so a slow event loop can't push us past Discord's 3s response deadline
+        await interaction.response.defer(ephemeral=True, thinking=True)
+
         user_format_choice = self.values[0]
 
         final_timestamp = f'<t:{self.epoch_time}:{user_format_choice}>'
@@ -130,39 +245,47 @@ class TimestampDropdown(discord.ui.Select):
         )
 
         resp_view = discord.ui.View()
-        resp_view.add_item(show_all_button(self.time_obj))
+        resp_view.add_item(show_all_button(self.epoch_time))
         resp_view.add_item(timezone_guide_button())
 
         # using .respond() so only visible to triggering user (vs .send())
         console_log_with_time(f'Sent standard final timestamp embed to {get_user_tag_from_origin(interaction)}')
-        await interaction.response.send_message(embed=timestamp_embed, view=resp_view, ephemeral=True)
+        await interaction.followup.send(embed=timestamp_embed, view=resp_view, ephemeral=True)
+
+
+@functools.lru_cache(maxsize=1024)
+def _all_timestamps_fields(epoch_time: int) -> tuple[tuple[str, str], ...]:
+    """(name, value) embed fields for every Discord timestamp of epoch_time, cached so repeat presses can reuse them"""
+
+    discord_stamps = [f'<t:{epoch_time}:{format_key}>' for format_key in _ALL_FORMAT_KEYS]
+    # \\ escapes timestamp so raw string is displayed in Discord
+    return tuple((discord_stamp, f'\\{discord_stamp}') for discord_stamp in discord_stamps)
 
 
 async def send_all_timestamps_embed(interaction: Interaction, epoch_time: int) -> None:
     """Creates and sends an Embed with all possible Discord timestamps for epoch_time (in secs)"""
 
+    await interaction.response.defer(ephemeral=True, thinking=True)
+
     response_embed = Embed(
         title='All the timestamp options!',
         description='Too much choice can only be a good thing, right?\n'
                     '***On mobile**, long press the date/time string to copy the format code shown below.*',
     )
 
-    # don't forget to add relative back in to the list
-    full_format_key_list = list(TIME_FORMAT_TEMPLATES.values()) + ['R']
-    for format_key in full_format_key_list:
-        discord_stamp = f'<t:{epoch_time}:{format_key}>'
+    for name, value in _all_timestamps_fields(epoch_time):
         # adds each separate timestamp variation as a new inline field
-        # \\ escapes timestamp so raw string is displayed in Discord
-        response_embed.add_field(name=discord_stamp, value=f'\\{discord_stamp}', inline=True)
+        response_embed.add_field(name=name, value=value, inline=True)
 
     console_log_with_time(f'Sent all timestamps embed to {get_user_tag_from_origin(interaction)}')
-    await interaction.response.send_message(embed=response_embed, ephemeral=True)
+    await interaction.followup.send(embed=response_embed, ephemeral=True)
 
 
-async def send_success_response(repliable: Context | Interaction, time_obj: datetime, utc_offset_used: bool):
+async def send_success_response(repliable: Context | Interaction, time_obj: datetime, epoch_time: int,
+                                utc_offset_used: bool):
     resp_view = discord.ui.View()
-    resp_view.add_item(show_all_button(time_obj))
-    resp_view.add_item(TimestampDropdown(time_obj, utc_offset_used))
+    resp_view.add_item(show_all_button(epoch_time))
+    resp_view.add_item(TimestampDropdown(time_obj, epoch_time, utc_offset_used))
 
     reply_data = dict(
         content='Your date passed the reality test!\n'
@@ -177,20 +300,22 @@ async def send_success_response(repliable: Context | Interaction, time_obj: date
     console_log_with_time(f'Sent format selection embed in response to {get_user_tag_from_origin(repliable)}')
 
 
-async def error_with_time_values(repliable: Context | Interaction):
-    error_embed = Embed(
-        title="That date didn't seem to work out :/",
-        description='Make sure your input date+time is in the format '
-                    '`YYYY/MM/DD HH:MM[±HHMM]` and is actually a date that exists!\n'
-                    'e.g. `2021/08/21 22:05`, `2021/08/22 00:05+0200`, `2021/08/21 18:35-0330`\n'
-                    "Don't forget: either `HH:MM` is in UTC "
-                    "or you've included a UTC-offset, `±HHMM` (*note no colon*)!"
-    )
+# the error embed is always the same so only build it once (only the View needs to be fresh for each reply)
+_ERROR_EMBED = Embed(
+    title="That date didn't seem to work out :/",
+    description='Make sure your input date+time is in the format '
+                '`YYYY/MM/DD HH:MM[±HHMM]` and is actually a date that exists!\n'
+                'e.g. `2021/08/21 22:05`, `2021/08/22 00:05+0200`, `2021/08/21 18:35-0330`\n'
+                "Don't forget: either `HH:MM` is in UTC "
+                "or you've included a UTC-offset, `±HHMM` (*note no colon*)!"
+)
 
+
+async def error_with_time_values(repliable: Context | Interaction):
     help_button_view = discord.ui.View()
     help_button_view.add_item(timezone_guide_button())
 
-    reply_data = dict(embed=error_embed, view=help_button_view, ephemeral=True)
+    reply_data = dict(embed=_ERROR_EMBED, view=help_button_view, ephemeral=True)
     if isinstance(repliable, Context):
         await repliable.reply(**reply_data)
     elif isinstance(repliable, Interaction):
@@ -212,57 +337,43 @@ async def error_with_time_values(repliable: Context | Interaction):
 )
 # together with t! prefix, spells 't!mestamp' - the main bot command
 async def mestamp(ctx: Context, *, user_datetime: str = ''):
-    try:  # Assuming user_datetime includes a UTC offset (e.g. +0100)
-        # creates an aware datetime obj since it includes a UTC offset (%z)
-        time_obj = datetime.strptime(user_datetime.strip(), '%Y/%m/%d %H:%M%z')
-        utc_offset_used = True
-    except ValueError:  # i.e. user_datetime doesn't match the expected format
-        try:  # maybe it didn't include a UTC offset?
-            # in this case assume their time is UTC (no offset, %z) and create a naive datetime obj
-            time_obj = datetime.strptime(user_datetime.strip(), '%Y/%m/%d %H:%M')
-            time_obj = time_obj.replace(tzinfo=timezone.utc)  # make datetime obj aware by adding tzinfo
-            utc_offset_used = False
-        except ValueError:  # user_datetime didn't match either expected format :(
-            await error_with_time_values(ctx)
-            return  # exit function - no valid datetime entered
+    try:
+        time_obj, epoch_time, utc_offset_used = parse_user_datetime(user_datetime.strip())
+    except ValueError:  # user_datetime didn't match the expected format :(
+        await error_with_time_values(ctx)
+        return  # exit function - no valid datetime entered
 
     # if we reached here and function wasn't exited - date must be valid!
-    await send_success_response(ctx, time_obj, utc_offset_used)
+    await send_success_response(ctx, time_obj, epoch_time, utc_offset_used)
 
 
 @bot.tree.command(description='Converts a datetime to a Discord timestamp interactively in 1 of 6 formats.')
 @discord.app_commands.describe(offset='UTC offset in format ±HHMM (*note no colon*)')
 async def timestamp(interaction: Interaction,
-                    year: int,
+                    year: discord.app_commands.Range[int, 1, 9999],  # datetime.MINYEAR to MAXYEAR
                     month: discord.app_commands.Range[int, 1, 12],
                     day: discord.app_commands.Range[int, 1, 31],
                     hour: discord.app_commands.Range[int, 0, 23],
                     minutes: discord.app_commands.Range[int, 0, 59],
                     offset: Optional[str] = ''):
 
-    constructed_date_str = f'{year:04}/{month:02}/{day:02} {hour:02}:{minutes:02}'
-    strp_str = '%Y/%m/%d %H:%M'
-    if offset:
-        utc_offset_used = True
-        constructed_date_str += f'{offset}'
-        strp_str += '%z'
-    else:
-        utc_offset_used = False
-
+    # values are already ints so skip strptime and construct the (aware) datetime obj directly
+    utc_offset_used = bool(offset)
     try:
-        time_obj = datetime.strptime(constructed_date_str, strp_str)
-    except ValueError:
+        offset_secs = parse_utc_offset(offset) if utc_offset_used else 0
+        time_obj, epoch_time = build_datetime(year, month, day, hour, minutes, offset_secs)
+    except ValueError:  # e.g. malformed offset or a day that doesn't exist (Feb 30th)
         await error_with_time_values(interaction)
         return
 
-    if not utc_offset_used:
-        time_obj = time_obj.replace(tzinfo=timezone.utc)
-
-    await send_success_response(interaction, time_obj, utc_offset_used)
+    await send_success_response(interaction, time_obj, epoch_time, utc_offset_used)
 
 
 @bot.event  # initial start-up event
 async def on_ready():
+    global _WOW_EMOJI
+    _WOW_EMOJI = bot.get_emoji(816705774201077830)  # id of LLK Discord :wow: emoji
+
     await bot.change_presence(activity=discord.Game('type t!help mestamp to see help'))
 
     sync_guild = discord.Object(id=145229754390282240)
@@ -273,5 +384,9 @@ async def on_ready():
     console_log_with_time('Timestamp Maker Bot is ready and raring to accept commands via Discord!')
 
 
-# DEPLOY TODO: hardcode token
-bot.run(os.environ['DISCORD_TIMESTAMP_TOKEN'])
+_console_log_listener.start()
+try:
+    # DEPLOY TODO: hardcode token
+    bot.run(os.environ['DISCORD_TIMESTAMP_TOKEN'])
+finally:  # writes out any log lines still queued, even if the bot crashed
+    _console_log_listener.stop()